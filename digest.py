@@ -5,114 +5,357 @@ Scans RSS feeds and generates personalized research digest using Gemini AI
 """
 
 import os
+import re
+import html
+import gzip
+import json
+import string
+import hashlib
+import urllib.error
+import urllib.request
 import yaml
 import feedparser
 import google.generativeai as genai
-from datetime import datetime
+from datetime import datetime, timedelta
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
 import smtplib
 from email.mime.text import MIMEText
 from email.mime.multipart import MIMEMultipart
 
+try:
+    from yaml import CSafeLoader as SafeLoader
+except ImportError:  # PyYAML built without libyaml
+    from yaml import SafeLoader
+
+try:
+    from orjson import loads as json_loads
+except ImportError:  # orjson is optional, fall back to the standard library
+    from json import loads as json_loads
+
 
 def load_config():
     """Load configuration from config.yaml"""
     with open('config.yaml', 'r') as f:
-        return yaml.safe_load(f)
+        return yaml.load(f, Loader=SafeLoader)
 
 
-def fetch_papers(feeds):
-    """Fetch papers from RSS feeds"""
-    papers = []
-    for feed_info in feeds:
-        print(f"Fetching from {feed_info['name']}...")
-        feed = feedparser.parse(feed_info['url'])
+FEED_CACHE_PATH = '.feedcache.json'
+MAX_ENTRIES_PER_FEED = 50
 
-        for entry in feed.entries[:50]:  # Limit to 50 recent papers per feed
-            papers.append({
-                'title': entry.get('title', ''),
-                'summary': entry.get('summary', ''),
-                'link': entry.get('link', ''),
-                'source': feed_info['name']
-            })
+# One fetched paper; lighter than a dict per entry
+Paper = namedtuple('Paper', 'title summary link source')
 
-    return papers
+TAG_RE = re.compile(r'<[^>]+>')
+WHITESPACE_RE = re.compile(r'\s+')
 
 
-def filter_and_rank_papers(papers, research_interests, max_papers):
-    """Use Gemini to filter and rank papers by relevance"""
-    api_key = os.environ.get('GEMINI_API_KEY')
-    if not api_key:
-        raise ValueError("GEMINI_API_KEY not found in environment variables")
+def clean_summary(summary):
+    """Strip HTML tags and entities and collapse whitespace in a feed summary"""
+    return WHITESPACE_RE.sub(' ', html.unescape(TAG_RE.sub(' ', summary))).strip()
+
+
+def load_feed_cache():
+    """Load ETag/Last-Modified validators saved by the previous run"""
+    try:
+        with open(FEED_CACHE_PATH, 'r') as f:
+            return json_loads(f.read())
+    except (FileNotFoundError, ValueError):
+        return {}
 
-    genai.configure(api_key=api_key)
-    model = genai.GenerativeModel('gemini-2.0-flash-exp')
 
-    # Build papers list with full information
-    papers_list = []
-    for i, p in enumerate(papers[:150], 1):  # Increased to 150 papers
-        papers_list.append(f"{i}. **{p['title']}** (Source: {p['source']})\n   Abstract: {p['summary'][:400]}\n   Link: {p['link']}")
+def save_feed_cache(cache):
+    """Persist ETag/Last-Modified validators for the next run"""
+    with open(FEED_CACHE_PATH, 'w') as f:
+        json.dump(cache, f, indent=2)
 
-    prompt = f"""You are an expert research assistant with deep knowledge of academic literature.
+
+def truncate_feed(body, limit):
+    """Cut a raw feed document down to its first `limit` entries
+
+    The document's own closing tags are spliced back after the last kept
+    entry, so feedparser still sees well-formed XML.
+    """
+    for tag in (b'</entry>', b'</item>'):
+        end = -1
+        for _ in range(limit):
+            end = body.find(tag, end + 1)
+            if end == -1:
+                break
+        if end == -1:
+            continue
+
+        end += len(tag)
+        tail = body.rfind(tag) + len(tag)
+        return body[:end] + body[tail:]
+
+    return body
+
+
+def fetch_feed(url, validators=None, limit=MAX_ENTRIES_PER_FEED):
+    """Download a feed and parse the raw bytes with feedparser
+
+    Sends conditional headers from `validators`, so an unchanged feed
+    comes back as an empty 304 result instead of being downloaded again.
+    """
+    validators = validators or {}
+    request_headers = {
+        'User-Agent': 'research-digest',
+        'Accept': feedparser.http.ACCEPT_HEADER,
+        'Accept-Encoding': 'gzip',
+    }
+    if validators.get('etag'):
+        request_headers['If-None-Match'] = validators['etag']
+    if validators.get('modified'):
+        request_headers['If-Modified-Since'] = validators['modified']
+
+    request = urllib.request.Request(url, headers=request_headers)
+    try:
+        # Per-request timeout so a single slow feed can't stall the pool
+        with urllib.request.urlopen(request, timeout=15) as response:
+            body = response.read()
+            headers = {k.lower(): v for k, v in response.headers.items()}
+            final_url = response.geturl()
+    except urllib.error.HTTPError as e:
+        if e.code == 304:
+            return feedparser.FeedParserDict(entries=[], status=304, headers={})
+        raise
+
+    # Decompress here so truncate_feed and feedparser see the raw XML
+    if headers.pop('content-encoding', None) == 'gzip':
+        body = gzip.decompress(body)
+    headers.setdefault('content-location', final_url)
+
+    # Don't parse entries that would be thrown away anyway
+    truncated = truncate_feed(body, limit)
+    feed = feedparser.parse(truncated, response_headers=headers)
+    if truncated is not body and len(feed.entries) < limit:
+        # Truncation confused the parser, fall back to the full document
+        feed = feedparser.parse(body, response_headers=headers)
+    return feed
+
+
+def fetch_papers(feeds, max_workers=8):
+    """Fetch papers from RSS feeds concurrently
+
+    Returns the papers and the feed cache updated with the new validators;
+    the caller saves it once the papers have been delivered.
+    """
+    cache = load_feed_cache()
+
+    def fetch(feed_info):
+        print(f"Fetching from {feed_info['name']}...")
+        try:
+            return fetch_feed(feed_info['url'], cache.get(feed_info['url']))
+        except Exception as e:
+            print(f"Failed to fetch {feed_info['name']}: {e}")
+            return feedparser.FeedParserDict(entries=[], headers={})
+
+    papers = []
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        # map() keeps results in config order, so the digest stays deterministic
+        for feed_info, feed in zip(feeds, executor.map(fetch, feeds)):
+            if feed.get('status') == 304:
+                print(f"{feed_info['name']} unchanged since last run")
+                continue
+
+            # Results are consumed here on the main thread, so no lock is needed
+            etag = feed.headers.get('etag')
+            modified = feed.headers.get('last-modified')
+            if etag or modified:
+                cache[feed_info['url']] = {'etag': etag, 'modified': modified}
+            else:
+                cache.pop(feed_info['url'], None)
+
+            for entry in feed.entries[:MAX_ENTRIES_PER_FEED]:
+                papers.append(Paper(
+                    title=entry.get('title', ''),
+                    summary=clean_summary(entry.get('summary', '')),
+                    link=entry.get('link', ''),
+                    source=feed_info['name']
+                ))
+
+    return papers, cache
+
+
+# Normalised titles shorter than this ("Editorial", "Reply", "Erratum"...) are
+# too generic to identify a paper on their own
+MIN_DEDUPE_TITLE_LENGTH = 30
+
+
+def dedupe_papers(papers):
+    """Drop papers already seen under the same link or title (e.g. cross-listings)"""
+    seen_links = set()
+    seen_titles = set()
+    unique = []
+    for p in papers:
+        link = p.link.split('#')[0].rstrip('/')
+        title = re.sub(r'\W+', '', p.title.lower())[:80]
+        if len(title) < MIN_DEDUPE_TITLE_LENGTH:
+            title = ''
+        if (link and link in seen_links) or (title and title in seen_titles):
+            continue
+        seen_links.add(link)
+        seen_titles.add(title)
+        unique.append(p)
+
+    return unique
+
+
+REVIEWED_CACHE_PATH = '.reviewed.json'
+REVIEWED_RETENTION_DAYS = 180
+MAX_PROMPT_PAPERS = 150
+SCORING_CHUNK_SIZE = 25
+SCORING_WORKERS = 4
+
+# Structured output returned by Gemini for each chunk of papers
+SCORES_SCHEMA = {
+    'type': 'ARRAY',
+    'items': {
+        'type': 'OBJECT',
+        'properties': {
+            'id': {'type': 'INTEGER'},
+            'score': {'type': 'NUMBER'},
+        },
+        'required': ['id', 'score'],
+    },
+}
+
+
+def paper_key(paper):
+    """Stable identifier for a paper across runs"""
+    return hashlib.sha256((paper.title + '\n' + paper.link).encode()).hexdigest()
+
+
+def load_reviewed():
+    """Load the papers Gemini already reviewed in previous digests"""
+    try:
+        with open(REVIEWED_CACHE_PATH, 'r') as f:
+            return json_loads(f.read())
+    except (FileNotFoundError, ValueError):
+        return {}
+
+
+def save_reviewed(reviewed, papers):
+    """Record reviewed papers and forget entries older than the retention window"""
+    today = datetime.now()
+    cutoff = (today - timedelta(days=REVIEWED_RETENTION_DAYS)).strftime('%Y-%m-%d')
+    reviewed = {k: day for k, day in reviewed.items() if day >= cutoff}
+    for p in papers:
+        reviewed[paper_key(p)] = today.strftime('%Y-%m-%d')
+
+    with open(REVIEWED_CACHE_PATH, 'w') as f:
+        json.dump(reviewed, f)
+
+
+def build_instructions(research_interests):
+    """Build the static part of the prompt, identical from one run to the next"""
+    return f"""You are an expert research assistant with deep knowledge of academic literature.
 
 RESEARCHER'S PROFILE:
 {research_interests}
 
 YOUR TASK:
-Carefully review the papers below and select the TOP {max_papers} most valuable papers for this researcher.
-Be highly selective - only include papers that would genuinely advance their research.
-
-PAPERS TO REVIEW:
-{chr(10).join(papers_list)}
+Carefully review the papers you are given and score how valuable each one is for this researcher.
+Be highly selective - only papers that would genuinely advance their research deserve a high score.
 
 OUTPUT FORMAT:
-For each selected paper, provide:
+One object per paper, with the paper's number as "id" and its relevance as "score".
 
-### Title (Authors)
+SCORING:
+- 0.8 to 1.0: directly addresses their research questions, mechanisms, data or methods
+- 0.6 to 0.8: adjacent work that could clearly inform their research
+- below 0.6: anything they would not want to read this week
 
-**Source:** [Journal/Working Paper Series]
+CRITICAL INSTRUCTIONS:
+- Quality over quantity: most papers should score well below 0.6
+- For each paper, think: "Would I email this to them if I were their research assistant?"
+- Score every paper you are given, exactly once
+"""
 
-**Abstract:** [Full Paper Abstract]
 
-**Link:** [Full URL]
+def score_chunk(model, chunk, retries=1):
+    """Ask Gemini for relevance scores of one chunk of (number, paper) pairs
 
----
+    Returns {number: score}, or {} when the chunk still fails after retrying.
+    """
+    expected = {i for i, _ in chunk}
+    prompt = '\n'.join([
+        'PAPERS TO REVIEW:',
+        *(f"{i}. **{p.title}** (Source: {p.source})\n   Abstract: {p.summary[:400]}\n   Link: {p.link}"
+          for i, p in chunk),
+        '',
+    ])
+
+    for attempt in range(retries + 1):
+        try:
+            response = model.generate_content(
+                prompt,
+                generation_config={
+                    'response_mime_type': 'application/json',
+                    'response_schema': SCORES_SCHEMA,
+                }
+            )
+            scores = {int(item['id']): float(item['score']) for item in json_loads(response.text)}
+            if set(scores) != expected:
+                raise ValueError(f"{len(expected - set(scores))} ids missing, "
+                                 f"{len(set(scores) - expected)} unexpected")
+            return scores
+        except Exception as e:
+            if attempt == retries:
+                print(f"Scoring papers {chunk[0][0]}-{chunk[-1][0]} failed ({e}), skipping them")
+                return {}
+            print(f"Scoring papers {chunk[0][0]}-{chunk[-1][0]} failed ({e}), retrying...")
 
-CRITICAL INSTRUCTIONS:
-- Quality over quantity: It's better to return 5 exceptional papers than 15 mediocre ones
-- For each paper, think: "Would I email this to them if I were their research assistant?"
-- Order papers by relevance (most relevant first)
-- If fewer than {max_papers} papers meet the high bar, that's okay - only return the truly valuable ones
 
-"""
+def filter_and_rank_papers(papers, research_interests, max_papers, min_score=0.6):
+    """Use Gemini to filter and rank papers by relevance
 
-    response = model.generate_content(prompt)
-    return response.text
+    Papers are scored in small chunks by concurrent requests, then merged
+    and ranked locally. Returns the selected papers, most relevant first,
+    and the papers Gemini actually scored (chunks that failed are left out).
+    """
+    api_key = os.environ.get('GEMINI_API_KEY')
+    if not api_key:
+        raise ValueError("GEMINI_API_KEY not found in environment variables")
 
+    genai.configure(api_key=api_key)
+    # Static instructions live in the system prompt, separate from the papers that
+    # vary per call. This is only a structural split: gemini-2.0-flash-exp has no
+    # prompt caching, so the instructions are billed again with every chunk request.
+    model = genai.GenerativeModel(
+        'gemini-2.0-flash-exp',
+        system_instruction=build_instructions(research_interests)
+    )
 
-def generate_html_email(digest_content, config):
-    """Generate HTML email from digest content"""
-    # Convert markdown-style formatting to HTML
-    import re
+    numbered = list(enumerate(papers[:MAX_PROMPT_PAPERS], 1))
+    chunks = [numbered[i:i + SCORING_CHUNK_SIZE] for i in range(0, len(numbered), SCORING_CHUNK_SIZE)]
 
-    # Convert ### headings to h3
-    digest_content = re.sub(r'###\s+(.+)', r'<h3>\1</h3>', digest_content)
+    scores = {}
+    with ThreadPoolExecutor(max_workers=SCORING_WORKERS) as executor:
+        for chunk_scores in executor.map(lambda chunk: score_chunk(model, chunk), chunks):
+            scores.update(chunk_scores)
 
-    # Convert **bold** to <strong>
-    digest_content = re.sub(r'\*\*(.+?)\*\*', r'<strong>\1</strong>', digest_content)
+    if not scores:
+        raise RuntimeError("Gemini failed to score any papers")
 
-    # Convert links
-    digest_content = re.sub(r'\[(.+?)\]\((.+?)\)', r'<a href="\2">\1</a>', digest_content)
+    # sorted() is stable, so ties keep their feed order
+    ranked = sorted(
+        ((i, p) for i, p in numbered if i in scores and scores[i] >= min_score),
+        key=lambda pair: scores[pair[0]],
+        reverse=True
+    )
+    scored = [p for i, p in numbered if i in scores]
+    return [p for _, p in ranked[:max_papers]], scored
 
-    # Convert line breaks
-    digest_content = digest_content.replace('\n\n', '<br><br>')
 
-    html = f"""
+EMAIL_TEMPLATE = string.Template("""
     <html>
     <head>
         <meta charset="UTF-8">
         <meta name="viewport" content="width=device-width, initial-scale=1.0">
         <style>
-            body {{
+            body {
                 font-family: -apple-system, BlinkMacSystemFont, 'Segoe UI', Roboto, Helvetica, Arial, sans-serif;
                 line-height: 1.6;
                 color: #1a1a1a;
@@ -120,66 +363,66 @@ def generate_html_email(digest_content, config):
                 margin: 0 auto;
                 padding: 20px;
                 background-color: #ffffff;
-            }}
-            h1 {{
+            }
+            h1 {
                 color: #0060df;
                 font-size: 28px;
                 margin-bottom: 10px;
                 border-bottom: 3px solid #0060df;
                 padding-bottom: 10px;
-            }}
-            h3 {{
+            }
+            h3 {
                 color: #003d99;
                 font-size: 18px;
                 margin-top: 30px;
                 margin-bottom: 12px;
                 line-height: 1.4;
-            }}
-            .meta {{
+            }
+            .meta {
                 color: #666;
                 font-size: 14px;
                 margin-bottom: 30px;
-            }}
-            a {{
+            }
+            a {
                 color: #0060df;
                 text-decoration: none;
                 font-weight: 500;
-            }}
-            a:hover {{
+            }
+            a:hover {
                 color: #003d99;
                 text-decoration: underline;
-            }}
-            strong {{
+            }
+            strong {
                 color: #003d99;
                 font-weight: 600;
-            }}
-            hr {{
+            }
+            hr {
                 border: none;
                 border-top: 1px solid #e0e0e0;
                 margin: 40px 0 20px 0;
-            }}
-            .footer {{
+            }
+            .footer {
                 color: #999;
                 font-size: 13px;
                 margin-top: 40px;
                 padding-top: 20px;
                 border-top: 1px solid #e0e0e0;
-            }}
-            .summary {{
+            }
+            .summary {
                 background-color: #f8f9fa;
                 padding: 15px;
                 border-radius: 8px;
                 margin: 20px 0;
                 font-style: italic;
                 color: #555;
-            }}
+            }
         </style>
     </head>
     <body>
         <h1>📚 Research Digest</h1>
-        <p class="meta">{datetime.now().strftime('%B %d, %Y')}</p>
+        <p class="meta">$date</p>
 
-        {digest_content}
+        $body
 
         <div class="footer">
             <p>Generated by your personal <a href="https://github.com/zytynski/research-digest">Research Digest</a></p>
@@ -187,47 +430,108 @@ def generate_html_email(digest_content, config):
         </div>
     </body>
     </html>
-    """
-    return html
+    """)
+
+
+PAPER_TEMPLATE = string.Template("""<h3>$title</h3>
+        <p><strong>Source:</strong> $source</p>
+        <p><strong>Abstract:</strong> $summary</p>
+        <p><strong>Link:</strong> <a href="$link">$link</a></p>
+        <hr>""")
+
+
+def generate_html_email(papers, config):
+    """Generate HTML email from the selected papers"""
+    if papers:
+        body = '\n        '.join(
+            PAPER_TEMPLATE.substitute(
+                title=html.escape(p.title),
+                source=html.escape(p.source),
+                summary=html.escape(p.summary),
+                link=html.escape(p.link)
+            )
+            for p in papers
+        )
+    else:
+        body = "<p>No papers met the relevance bar this time.</p>"
 
+    return EMAIL_TEMPLATE.substitute(
+        date=datetime.now().strftime('%B %d, %Y'),
+        body=body
+    )
 
-def send_email(html_content, config):
-    """Send digest via email using Gmail SMTP"""
-    email_method = config.get('email_method', 'print')
 
-    if email_method == 'print':
-        # Preview mode - just print the digest
-        print("Email generation successful!")
-        print(f"Would send to: {config['email']}")
-        print("\nPreview:")
-        print(html_content[:500])
-        return
+def print_digest(papers, config):
+    """Preview the selected papers as plain text, without building the HTML email"""
+    print("Digest generation successful!")
+    print(f"Would send to: {config['email']}")
+    print("\nPreview:")
+    for i, p in enumerate(papers, 1):
+        print(f"{i}. {p.title} ({p.source})\n   {p.link}")
 
-    elif email_method == 'gmail':
-        # Gmail SMTP
-        sender_email = os.environ.get('GMAIL_ADDRESS')
-        sender_password = os.environ.get('GMAIL_APP_PASSWORD')
 
-        if not sender_email or not sender_password:
-            raise ValueError("Gmail credentials not found. Set GMAIL_ADDRESS and GMAIL_APP_PASSWORD in secrets.")
+def connect_gmail():
+    """Open an authenticated SMTP connection to Gmail"""
+    sender_email = os.environ.get('GMAIL_ADDRESS')
+    sender_password = os.environ.get('GMAIL_APP_PASSWORD')
+
+    if not sender_email or not sender_password:
+        raise ValueError("Gmail credentials not found. Set GMAIL_ADDRESS and GMAIL_APP_PASSWORD in secrets.")
+
+    server = smtplib.SMTP_SSL('smtp.gmail.com', 465)
+    try:
+        server.login(sender_email, sender_password)
+    except Exception:
+        server.close()
+        raise
+    return server
 
-        msg = MIMEMultipart('alternative')
-        msg['Subject'] = f"Research Digest - {datetime.now().strftime('%Y-%m-%d')}"
-        msg['From'] = sender_email
-        msg['To'] = config['email']
 
-        html_part = MIMEText(html_content, 'html')
-        msg.attach(html_part)
+def send_email(html_content, config, server=None):
+    """Send digest via email using Gmail SMTP
 
+    Only used for the 'gmail' method; print mode previews with print_digest().
+    `server` is an already connected SMTP session from connect_gmail();
+    a new one is opened when it isn't given. The session used is returned
+    still open, so it can be reused for further sends; the caller closes it.
+    """
+    email_method = config.get('email_method', 'print')
+
+    if email_method == 'gmail':
+        # Gmail SMTP
         try:
-            with smtplib.SMTP_SSL('smtp.gmail.com', 465) as server:
-                server.login(sender_email, sender_password)
+            if server is None:
+                server = connect_gmail()
+
+            msg = MIMEMultipart('alternative')
+            msg['Subject'] = f"Research Digest - {datetime.now().strftime('%Y-%m-%d')}"
+            # connect_gmail() already checked the credentials, so this is set
+            msg['From'] = os.environ['GMAIL_ADDRESS']
+            msg['To'] = config['email']
+
+            html_part = MIMEText(html_content, 'html')
+            msg.attach(html_part)
+
+            try:
+                server.send_message(msg)
+            except (smtplib.SMTPServerDisconnected, smtplib.SMTPSenderRefused) as e:
+                # Gmail drops idle sessions, either outright or with a 421 to MAIL FROM;
+                # any other refusal is a real error
+                if isinstance(e, smtplib.SMTPSenderRefused) and e.smtp_code != 421:
+                    raise
+                # Reconnect once and retry
+                server.close()
+                server = connect_gmail()
                 server.send_message(msg)
             print(f"Email sent successfully to {config['email']}")
         except Exception as e:
             print(f"Failed to send email: {e}")
+            if server is not None:
+                server.close()
             raise
 
+        return server
+
     else:
         raise ValueError(f"Unknown email method: {email_method}. Use 'print' or 'gmail'")
 
@@ -241,22 +545,76 @@ def main():
     print(f"Configuration loaded for: {config['email']}")
 
     # Fetch papers
-    papers = fetch_papers(config['feeds'])
+    papers, feed_cache = fetch_papers(config['feeds'], config.get('fetch_workers', 8))
     print(f"Fetched {len(papers)} papers from {len(config['feeds'])} sources")
 
-    # Filter and rank
-    print("Analyzing papers with AI...")
-    digest_content = filter_and_rank_papers(
-        papers,
-        config['research_interests'],
-        config['max_papers']
-    )
+    papers = dedupe_papers(papers)
+    print(f"{len(papers)} unique papers after removing duplicates")
+
+    # Skip papers already judged in a previous digest
+    reviewed = load_reviewed()
+    papers = [p for p in papers if paper_key(p) not in reviewed]
+    print(f"{len(papers)} papers not reviewed in a previous digest")
+
+    if not papers:
+        # Everything fetched was already reviewed, so the new validators are safe to keep
+        save_feed_cache(feed_cache)
+        print("No new papers since the last digest, nothing to send.")
+        return
+
+    email_method = config.get('email_method', 'print')
+    with ThreadPoolExecutor(max_workers=1) as executor:
+        # Connect and log in to Gmail while Gemini works on the digest
+        smtp_future = None
+        if email_method == 'gmail':
+            smtp_future = executor.submit(connect_gmail)
+
+        # Filter and rank
+        print("Analyzing papers with AI...")
+        try:
+            selected, scored = filter_and_rank_papers(
+                papers,
+                config['research_interests'],
+                config['max_papers'],
+                config.get('min_relevance_score', 0.6)
+            )
+        except Exception:
+            # Don't leave the pre-opened Gmail session behind
+            if smtp_future is not None and smtp_future.exception() is None:
+                smtp_future.result().close()
+            raise
+
+        print(f"Selected {len(selected)} papers")
+
+    if email_method == 'print':
+        # Preview mode - skip building the HTML email entirely
+        print_digest(selected, config)
+        print("Digest generation complete!")
+        return
 
     # Generate email
-    html_email = generate_html_email(digest_content, config)
+    html_email = generate_html_email(selected, config)
 
     # Send email
-    send_email(html_email, config)
+    server = send_email(html_email, config, smtp_future.result() if smtp_future else None)
+
+    # Only remember papers once a digest was actually delivered
+    save_reviewed(reviewed, scored)
+
+    # Feeds with papers Gemini never scored must be downloaded in full next time
+    scored = set(scored)
+    pending = {p.source for p in papers if p not in scored}
+    for feed_info in config['feeds']:
+        if feed_info['name'] in pending:
+            feed_cache.pop(feed_info['url'], None)
+    save_feed_cache(feed_cache)
+
+    if server is not None:
+        # The digest is already delivered; a connection dropped after DATA must not fail the run
+        try:
+            server.quit()
+        except smtplib.SMTPException:
+            server.close()
 
     print("Digest generation complete!")
 